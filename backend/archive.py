@@ -0,0 +1,114 @@
+from datetime import datetime, timedelta
+from sqlalchemy import func, insert, literal, select, text, union_all
+from sqlalchemy.orm import Session
+from models import Maintenance, MaintenanceArchive, MaintenanceRollup
+
+# Maintenance records older than this are moved out of the hot table
+MAINTENANCE_ARCHIVE_AGE_DAYS = 365
+
+
+def archive_maintenance(db: Session, older_than_days: int = MAINTENANCE_ARCHIVE_AGE_DAYS):
+    """Move old maintenance records to the archive table and update the per-asset rollups"""
+    if maintenance_ids_reusable(db):
+        # Archived ids could be handed out again to new records
+        raise RuntimeError("Run migrate_maintenance_ids.py before archiving maintenance records")
+
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    is_old = Maintenance.date < cutoff
+
+    totals = (
+        db.query(Maintenance.asset_id, func.count(Maintenance.id), func.coalesce(func.sum(Maintenance.cost), 0.0))
+        .filter(is_old)
+        .group_by(Maintenance.asset_id)
+        .all()
+    )
+    if not totals:
+        return {"archived": 0, "cutoff": cutoff.isoformat()}
+
+    db.execute(
+        insert(MaintenanceArchive).from_select(
+            ["id", "asset_id", "date", "activity", "cost", "notes", "archived_at"],
+            select(
+                Maintenance.id, Maintenance.asset_id, Maintenance.date, Maintenance.activity,
+                Maintenance.cost, Maintenance.notes, literal(datetime.utcnow())
+            ).where(is_old)
+        )
+    )
+
+    rollups = load_rollups(db, [t[0] for t in totals])
+    for asset_id, count, cost in totals:
+        add_to_rollup(db, rollups, asset_id, count, cost)
+
+    archived = db.query(Maintenance).filter(is_old).delete(synchronize_session=False)
+    db.commit()
+    return {"archived": archived, "cutoff": cutoff.isoformat()}
+
+
+def load_rollups(db: Session, asset_ids):
+    """Existing rollups for these asset IDs (None is the orphan bucket), keyed by asset_id"""
+    ids = [a for a in asset_ids if a is not None]
+    query = db.query(MaintenanceRollup)
+    if None in asset_ids:
+        query = query.filter(MaintenanceRollup.asset_id.in_(ids) | MaintenanceRollup.asset_id.is_(None))
+    else:
+        query = query.filter(MaintenanceRollup.asset_id.in_(ids))
+    return {r.asset_id: r for r in query}
+
+
+def add_to_rollup(db: Session, rollups, asset_id, count: int, cost: float):
+    rollup = rollups.get(asset_id)
+    if rollup is None:
+        rollups[asset_id] = rollup = MaintenanceRollup(asset_id=asset_id, record_count=0, total_cost=0.0)
+        db.add(rollup)
+    rollup.record_count += count
+    rollup.total_cost += cost
+
+
+def detach_asset_history(db: Session, asset_id: str):
+    """Unlink an asset's archived records and move its rollup into the orphan bucket.
+
+    Mirrors what deleting an asset does to its live maintenance rows, so a new
+    asset that reuses the ID doesn't inherit the old one's history. Does not commit.
+    """
+    db.query(MaintenanceArchive).filter(MaintenanceArchive.asset_id == asset_id).update(
+        {MaintenanceArchive.asset_id: None}, synchronize_session=False
+    )
+    rollups = load_rollups(db, [asset_id, None])
+    rollup = rollups.pop(asset_id, None)
+    if rollup is None:
+        return
+    add_to_rollup(db, rollups, None, rollup.record_count, rollup.total_cost)
+    db.delete(rollup)
+
+
+def maintenance_ids_reusable(db: Session) -> bool:
+    """True if the maintenance table predates AUTOINCREMENT and SQLite may reuse its ids"""
+    sql = db.execute(
+        text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'maintenance'")
+    ).scalar()
+    return sql is not None and "AUTOINCREMENT" not in sql.upper()
+
+
+def maintenance_totals(db: Session, asset_ids=None):
+    """Subquery of total maintenance cost per asset, hot records plus archived rollups"""
+    hot = select(Maintenance.asset_id.label("asset_id"), Maintenance.cost.label("cost"))
+    archived = select(MaintenanceRollup.asset_id.label("asset_id"), MaintenanceRollup.total_cost.label("cost"))
+    if asset_ids is not None:
+        hot = hot.where(Maintenance.asset_id.in_(asset_ids))
+        archived = archived.where(MaintenanceRollup.asset_id.in_(asset_ids))
+    combined = union_all(hot, archived).subquery()
+    return (
+        db.query(
+            combined.c.asset_id.label("asset_id"),
+            func.sum(combined.c.cost).label("maintenance_cost")
+        )
+        .group_by(combined.c.asset_id)
+        .subquery()
+    )
+
+
+def total_maintenance_cost(db: Session):
+    """Sum of all maintenance cost, including archived records"""
+    hot = db.query(func.sum(Maintenance.cost)).scalar() or 0.0
+    archived = db.query(func.sum(MaintenanceRollup.total_cost)).scalar() or 0.0
+    return hot + archived
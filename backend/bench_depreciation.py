@@ -0,0 +1,118 @@
+"""Benchmark the vectorized depreciation report against a naive per-object loop.
+
+Usage: python bench_depreciation.py [number_of_assets]
+"""
+import random
+import sys
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+
+import numpy as np
+from sqlalchemy import create_engine, func
+from sqlalchemy.orm import sessionmaker
+
+from database import Base
+from models import Asset, Maintenance
+from depreciation import load_fleet, depreciation_report, METHODS, STRAIGHT_LINE, DAYS_PER_YEAR, UNASSIGNED
+
+DEPARTMENTS = ["Finance", "HR", "IT", "Operations", "Sales", None]
+TYPES = ["Laptop", "Desktop", "Monitor", "Printer", "Phone", "Server"]
+
+# Group totals in the report are rounded to cents
+ROUNDING_TOLERANCE = 0.01
+
+
+def seed(db, count: int):
+    """Fill the database with random assets and maintenance records"""
+    rng = random.Random(42)
+    today = date.today()
+    assets = []
+    records = []
+    for i in range(count):
+        asset_id = f"BEN-{i:06d}"
+        assets.append({
+            "id": asset_id,
+            "type": rng.choice(TYPES),
+            "brand": "Bench",
+            "model": "B1",
+            "serial": f"SN-{i:06d}",
+            "purchase_date": (today - timedelta(days=rng.randint(0, 3650))).isoformat(),
+            "cost": round(rng.uniform(100, 5000), 2),
+            "warranty_status": "Active",
+            "status": "Active",
+            "department": rng.choice(DEPARTMENTS),
+        })
+        for _ in range(rng.randint(0, 3)):
+            records.append({
+                "asset_id": asset_id,
+                "activity": "Service",
+                "cost": round(rng.uniform(10, 500), 2),
+            })
+    db.bulk_insert_mappings(Asset, assets)
+    db.bulk_insert_mappings(Maintenance, records)
+    db.commit()
+
+
+def naive_report(db, method: str, useful_life: float, salvage_rate: float, as_of: date):
+    """Reference implementation: loop over ORM objects in Python"""
+    # Maintenance totals come from one query so only the per-object loop is compared
+    maintenance = dict(
+        db.query(Maintenance.asset_id, func.sum(Maintenance.cost)).group_by(Maintenance.asset_id)
+    )
+    rate = min(2.0 / useful_life, 1.0)
+    groups = {"by_department": defaultdict(lambda: {"book_value": 0.0, "tco": 0.0}),
+              "by_type": defaultdict(lambda: {"book_value": 0.0, "tco": 0.0})}
+    for asset in db.query(Asset).all():
+        age = max((as_of - date.fromisoformat(asset.purchase_date)).days, 0) / DAYS_PER_YEAR
+        salvage = asset.cost * salvage_rate
+        if method == STRAIGHT_LINE:
+            depreciable = asset.cost - salvage
+            book_value = asset.cost - min(depreciable * age / useful_life, depreciable)
+        else:
+            book_value = max(asset.cost * (1.0 - rate) ** age, salvage)
+        tco = asset.cost + maintenance.get(asset.id, 0.0)
+        for grouping, key in (("by_department", asset.department or UNASSIGNED), ("by_type", asset.type)):
+            groups[grouping][key]["book_value"] += book_value
+            groups[grouping][key]["tco"] += tco
+    return groups
+
+
+def check(expected, report):
+    """Both implementations must agree to within the report's rounding"""
+    for grouping, groups in expected.items():
+        assert set(groups) == set(report[grouping]), grouping
+        for key, totals in groups.items():
+            actual = report[grouping][key]
+            for name in ("book_value", "tco"):
+                assert np.isclose(actual[name], totals[name], rtol=0, atol=ROUNDING_TOLERANCE), (grouping, key, name)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    seed(db, count)
+    as_of = date.today()
+
+    print(f"assets:      {count}")
+    for method in METHODS:
+        start = time.perf_counter()
+        expected = naive_report(db, method, 5.0, 0.1, as_of)
+        naive_time = time.perf_counter() - start
+        db.expunge_all()
+
+        start = time.perf_counter()
+        report = depreciation_report(load_fleet(db), method, 5.0, 0.1, as_of)
+        vectorized_time = time.perf_counter() - start
+
+        check(expected, report)
+        print(f"{method}:")
+        print(f"  naive loop:  {naive_time:.3f}s")
+        print(f"  vectorized:  {vectorized_time:.3f}s")
+        print(f"  speedup:     {naive_time / vectorized_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
 from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from deadline import enforce_deadlines
 
 # Database URL (SQLite in this case)
 DATABASE_URL = "sqlite:///./itams.db"
@@ -10,6 +11,9 @@ engine = create_engine(
     DATABASE_URL, connect_args={"check_same_thread": False}
 )
 
+# Abort statements that run past the current request's deadline
+enforce_deadlines(engine)
+
 # Create a local session
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -0,0 +1,63 @@
+import time
+from contextvars import ContextVar
+from sqlalchemy import event
+
+# Time budget (in seconds) per request; the longest matching path prefix wins
+DEFAULT_DEADLINE_SECONDS = 5.0
+ROUTE_DEADLINES = {
+    "/report/": 15.0,
+    "/maintenance/archive": 60.0,
+}
+
+# Number of SQLite VM instructions between deadline checks
+PROGRESS_HANDLER_INTERVAL = 1000
+
+# Monotonic time at which the current request must finish, or None outside a request
+request_deadline = ContextVar("request_deadline", default=None)
+
+
+def deadline_for(path: str, default: float = DEFAULT_DEADLINE_SECONDS, routes=None) -> float:
+    """Pick the budget for a path from the longest matching prefix"""
+    routes = ROUTE_DEADLINES if routes is None else routes
+    matches = [prefix for prefix in routes if path.startswith(prefix)]
+    if not matches:
+        return default
+    return routes[max(matches, key=len)]
+
+
+def deadline_exceeded() -> bool:
+    deadline = request_deadline.get()
+    return deadline is not None and time.monotonic() >= deadline
+
+
+def abort_if_past_deadline() -> int:
+    # SQLite aborts the running statement when the progress handler returns non-zero
+    return 1 if deadline_exceeded() else 0
+
+
+def enforce_deadlines(engine):
+    """Install the deadline check on every SQLite connection the engine opens"""
+    @event.listens_for(engine, "connect")
+    def set_progress_handler(dbapi_connection, connection_record):
+        dbapi_connection.set_progress_handler(abort_if_past_deadline, PROGRESS_HANDLER_INTERVAL)
+
+
+class DeadlineMiddleware:
+    """Start the clock for each HTTP request using its route's deadline"""
+
+    def __init__(self, app, default: float = DEFAULT_DEADLINE_SECONDS, routes=None):
+        self.app = app
+        self.default = default
+        self.routes = ROUTE_DEADLINES if routes is None else routes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        seconds = deadline_for(scope["path"], self.default, self.routes)
+        token = request_deadline.set(time.monotonic() + seconds)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            request_deadline.reset(token)
@@ -0,0 +1,163 @@
+import numpy as np
+from datetime import date
+from typing import Optional
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from models import Asset
+from archive import maintenance_totals
+
+# Depreciation methods supported by the report
+STRAIGHT_LINE = "straight_line"
+DECLINING_BALANCE = "declining_balance"
+METHODS = (STRAIGHT_LINE, DECLINING_BALANCE)
+
+# Label used for assets without a department
+UNASSIGNED = "Unassigned"
+
+DAYS_PER_YEAR = 365.25
+
+
+def load_fleet(db: Session):
+    """Load the columns needed for depreciation in one query, as NumPy arrays"""
+    totals = maintenance_totals(db)
+    rows = (
+        db.query(
+            Asset.id,
+            Asset.department,
+            Asset.type,
+            Asset.purchase_date,
+            Asset.cost,
+            func.coalesce(totals.c.maintenance_cost, 0.0)
+        )
+        .outerjoin(totals, Asset.id == totals.c.asset_id)
+        .order_by(Asset.id)
+        .all()
+    )
+
+    if rows:
+        ids, departments, types, purchase_dates, costs, maintenance = zip(*rows)
+    else:
+        ids = departments = types = purchase_dates = costs = maintenance = ()
+
+    return {
+        "id": np.array(ids, dtype=object),
+        "department": np.array([d or UNASSIGNED for d in departments], dtype=object),
+        "type": np.array(types, dtype=object),
+        "purchase_date": parse_dates(purchase_dates),
+        "cost": np.array(costs, dtype=np.float64),
+        "maintenance_cost": np.array(maintenance, dtype=np.float64),
+    }
+
+
+def parse_dates(values):
+    """Convert ISO date strings to datetime64[D]; unparseable values become NaT"""
+    cleaned = [str(v)[:10] if v else "NaT" for v in values]
+    try:
+        return np.array(cleaned, dtype="datetime64[D]")
+    except ValueError:
+        # Fall back to element-wise parsing so one bad row doesn't sink the report
+        parsed = np.empty(len(cleaned), dtype="datetime64[D]")
+        for i, value in enumerate(cleaned):
+            try:
+                parsed[i] = np.datetime64(value, "D")
+            except ValueError:
+                parsed[i] = np.datetime64("NaT")
+        return parsed
+
+
+def age_in_years(purchase_dates, as_of: date):
+    """Fractional age of each asset in years (0 for future or unknown dates)"""
+    delta = np.datetime64(as_of, "D") - purchase_dates
+    days = np.where(np.isnat(delta), 0.0, delta.astype(np.float64))
+    return np.clip(days, 0.0, None) / DAYS_PER_YEAR
+
+
+def straight_line(cost, age, useful_life: float, salvage_rate: float):
+    """Book value under straight-line depreciation down to the salvage value"""
+    salvage = cost * salvage_rate
+    depreciable = cost - salvage
+    accumulated = np.minimum(depreciable * (age / useful_life), depreciable)
+    return cost - accumulated
+
+
+def declining_balance(cost, age, useful_life: float, salvage_rate: float, factor: float = 2.0):
+    """Book value under declining-balance depreciation, floored at the salvage value"""
+    rate = min(factor / useful_life, 1.0)
+    book = cost * np.power(1.0 - rate, age)
+    return np.maximum(book, cost * salvage_rate)
+
+
+def compute_book_values(fleet, method: str, useful_life: float, salvage_rate: float,
+                        as_of: date, factor: float = 2.0):
+    """Book value of every asset in the fleet as of the given date"""
+    age = age_in_years(fleet["purchase_date"], as_of)
+    if method == STRAIGHT_LINE:
+        return straight_line(fleet["cost"], age, useful_life, salvage_rate)
+    if method == DECLINING_BALANCE:
+        return declining_balance(fleet["cost"], age, useful_life, salvage_rate, factor)
+    raise ValueError(f"Unknown depreciation method '{method}'")
+
+
+def group_totals(keys, columns):
+    """Sum each column per distinct key using a single bincount pass"""
+    if len(keys) == 0:
+        return {}
+    labels, inverse = np.unique(keys.astype(str), return_inverse=True)
+    counts = np.bincount(inverse, minlength=len(labels))
+    sums = {
+        name: np.bincount(inverse, weights=values, minlength=len(labels))
+        for name, values in columns.items()
+    }
+    return {
+        label: {
+            "count": int(counts[i]),
+            **{name: round(float(total[i]), 2) for name, total in sums.items()},
+        }
+        for i, label in enumerate(labels)
+    }
+
+
+def depreciation_report(fleet, method: str = STRAIGHT_LINE, useful_life: float = 5.0,
+                        salvage_rate: float = 0.0, as_of: Optional[date] = None,
+                        factor: float = 2.0, include_assets: bool = False):
+    """Book value and total cost of ownership, overall and per department and type"""
+    as_of = as_of or date.today()
+    book_value = compute_book_values(fleet, method, useful_life, salvage_rate, as_of, factor)
+    cost = fleet["cost"]
+    maintenance_cost = fleet["maintenance_cost"]
+    columns = {
+        "cost": cost,
+        "book_value": book_value,
+        "accumulated_depreciation": cost - book_value,
+        "maintenance_cost": maintenance_cost,
+        "tco": cost + maintenance_cost,
+    }
+
+    report = {
+        "method": method,
+        "useful_life": useful_life,
+        "salvage_rate": salvage_rate,
+        "as_of": as_of.isoformat(),
+        "total_assets": int(len(cost)),
+        "totals": {name: round(float(values.sum()), 2) for name, values in columns.items()},
+        "by_department": group_totals(fleet["department"], columns),
+        "by_type": group_totals(fleet["type"], columns),
+    }
+
+    if include_assets:
+        report["assets"] = [
+            {
+                "id": asset_id,
+                "department": department,
+                "type": asset_type,
+                "cost": round(float(c), 2),
+                "book_value": round(float(b), 2),
+                "maintenance_cost": round(float(m), 2),
+                "tco": round(float(c + m), 2),
+            }
+            for asset_id, department, asset_type, c, b, m in zip(
+                fleet["id"], fleet["department"], fleet["type"], cost, book_value, maintenance_cost
+            )
+        ]
+
+    return report
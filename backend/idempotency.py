@@ -0,0 +1,176 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from auth import decode_access_token
+
+# How long a stored response can be replayed, and how many are kept at most
+IDEMPOTENCY_TTL_SECONDS = 24 * 60 * 60
+IDEMPOTENCY_MAX_ENTRIES = 10000
+IDEMPOTENCY_MAX_KEY_LENGTH = 255
+
+IDEMPOTENCY_HEADER = b"idempotency-key"
+REPLAYED_HEADER = b"idempotent-replayed"
+
+# CORS headers depend on the caller's origin, so they are never replayed
+CORS_HEADER_PREFIX = b"access-control-"
+
+# Marker stored while the first request for a key is still running
+IN_FLIGHT = object()
+
+
+class IdempotencyStore:
+    """Bounded LRU map of idempotency keys to stored responses, with a TTL"""
+
+    def __init__(self, max_entries: int = IDEMPOTENCY_MAX_ENTRIES, ttl: float = IDEMPOTENCY_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def reserve(self, key, fingerprint: str):
+        """Claim a key for a new request, or return the existing (fingerprint, response)"""
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] <= now:
+                del self.entries[key]
+                entry = None
+            if entry is not None:
+                self.entries.move_to_end(key)
+                return entry[1], entry[2]
+            self.entries[key] = (now + self.ttl, fingerprint, IN_FLIGHT)
+            self._evict(now)
+            return None
+
+    def complete(self, key, fingerprint: str, response):
+        """Store the finished response for replay"""
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, fingerprint, response)
+            self.entries.move_to_end(key)
+
+    def release(self, key):
+        """Forget a reservation whose request failed, so it can be retried"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[2] is IN_FLIGHT:
+                del self.entries[key]
+
+    def _evict(self, now: float):
+        # Drop expired entries from the cold end first, then the least recently used
+        while self.entries:
+            oldest_key, (expires_at, _, _) = next(iter(self.entries.items()))
+            if expires_at > now and len(self.entries) <= self.max_entries:
+                break
+            del self.entries[oldest_key]
+
+
+class IdempotencyMiddleware:
+    """Replay the stored response for POSTs that repeat an Idempotency-Key header.
+
+    A replay is answered straight from the store, before the request body is
+    validated or the route runs. Keys are scoped per user and path, and reusing
+    a key with a different body is rejected.
+    """
+
+    def __init__(self, app, paths, store: IdempotencyStore = None):
+        self.app = app
+        self.paths = set(paths)
+        self.store = store or IdempotencyStore()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        idempotency_key = headers.get(IDEMPOTENCY_HEADER)
+        if idempotency_key is None:
+            await self.app(scope, receive, send)
+            return
+        if not idempotency_key or len(idempotency_key) > IDEMPOTENCY_MAX_KEY_LENGTH:
+            await send_json(send, 400, {"detail": "Invalid Idempotency-Key header"})
+            return
+
+        body = await read_body(receive)
+        fingerprint = hashlib.sha256(body).hexdigest()
+        key = (principal(headers), scope["path"], idempotency_key)
+
+        existing = self.store.reserve(key, fingerprint)
+        if existing is not None:
+            stored_fingerprint, response = existing
+            if stored_fingerprint != fingerprint:
+                await send_json(send, 422, {"detail": "Idempotency-Key was already used with a different request body"})
+            elif response is IN_FLIGHT:
+                await send_json(send, 409, {"detail": "A request with this Idempotency-Key is still in progress"})
+            else:
+                await replay(send, response)
+            return
+
+        response = {"status": None, "headers": [], "body": b""}
+
+        async def replay_receive():
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        async def capture_send(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                response["headers"] = [
+                    (name, value) for name, value in message.get("headers", [])
+                    if not name.lower().startswith(CORS_HEADER_PREFIX)
+                ]
+            elif message["type"] == "http.response.body":
+                response["body"] += message.get("body", b"")
+            await send(message)
+
+        try:
+            await self.app(scope, replay_receive, capture_send)
+        except Exception:
+            self.store.release(key)
+            raise
+
+        # Server errors are not stored, so the client can retry them
+        if response["status"] is None or response["status"] >= 500:
+            self.store.release(key)
+        else:
+            self.store.complete(key, fingerprint, response)
+
+
+def principal(headers) -> str:
+    """Identify the caller so keys from different users never collide"""
+    authorization = headers.get(b"authorization", b"").decode("latin-1")
+    token = authorization[7:] if authorization.lower().startswith("bearer ") else authorization
+    token_data = decode_access_token(token) if token else None
+    if token_data is not None:
+        return token_data.email
+    return hashlib.sha256(authorization.encode("latin-1")).hexdigest()
+
+
+async def read_body(receive) -> bytes:
+    body = b""
+    more_body = True
+    while more_body:
+        message = await receive()
+        body += message.get("body", b"")
+        more_body = message.get("more_body", False)
+    return body
+
+
+async def replay(send, response):
+    await send({
+        "type": "http.response.start",
+        "status": response["status"],
+        "headers": response["headers"] + [(REPLAYED_HEADER, b"true")],
+    })
+    await send({"type": "http.response.body", "body": response["body"]})
+
+
+async def send_json(send, status_code: int, content: dict):
+    body = json.dumps(content).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status_code,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+    })
+    await send({"type": "http.response.body", "body": body})
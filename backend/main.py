@@ -1,10 +1,12 @@
-from fastapi import FastAPI, HTTPException, Depends, Query, status
+from fastapi import FastAPI, HTTPException, Depends, Query, Request, status
 from fastapi.security import OAuth2PasswordRequestForm
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
-from datetime import timedelta
+from datetime import timedelta, date
 from database import engine, get_db
-from models import Base, Asset, Maintenance, SoftwareLicense, User, Department
+from models import Base, Asset, Maintenance, MaintenanceArchive, SoftwareLicense, User, Department
 from schemas import (
     AssetCreate, MaintenanceCreate, SoftwareLicenseCreate,
     DepartmentCreate, DepartmentResponse,
@@ -17,11 +19,25 @@ from auth import (
 )
 from typing import Optional
 from sqlalchemy import func
+from sqlalchemy.exc import OperationalError
+from depreciation import load_fleet, depreciation_report, METHODS, STRAIGHT_LINE
+from snapshot import asset_snapshot, pivot
+from idempotency import IdempotencyMiddleware
+from archive import (
+    archive_maintenance, detach_asset_history,
+    maintenance_totals, total_maintenance_cost, MAINTENANCE_ARCHIVE_AGE_DAYS
+)
+from deadline import DeadlineMiddleware, deadline_exceeded
 
 
 app = FastAPI()
 Base.metadata.create_all(bind=engine)
 
+# --- Idempotency keys ---
+# Retried creates with the same Idempotency-Key header get the original response back.
+# Added before CORS so CORS wraps it and sets headers on replays and errors too
+app.add_middleware(IdempotencyMiddleware, paths=["/assets", "/maintenance", "/licenses"])
+
 # --- CORS setup ---
 app.add_middleware(
     CORSMiddleware,
@@ -31,6 +47,53 @@ app.add_middleware(
     allow_headers=["*"],
 )  
 
+# --- Request deadlines ---
+# Each request gets a time budget; SQL statements still running past it are aborted
+app.add_middleware(DeadlineMiddleware)
+
+@app.exception_handler(OperationalError)
+async def database_error_handler(request: Request, exc: OperationalError):
+    if not deadline_exceeded():
+        raise exc
+    print(f"⏱️ Deadline exceeded on {request.method} {request.url.path}: {exc.statement}")
+    return JSONResponse(status_code=504, content={"detail": "Request took too long and was cancelled."})
+
+# --- Response compression ---
+# Only applied when the client sends Accept-Encoding: gzip and the body is large enough
+GZIP_MINIMUM_SIZE = 1024
+app.add_middleware(GZipMiddleware, minimum_size=GZIP_MINIMUM_SIZE)
+
+# --- Sparse fieldsets ---
+def select_fields(model, fields: Optional[str]):
+    """Turn ?fields=id,brand into the matching columns, or None for the whole row"""
+    if not fields:
+        return None
+    names = [name.strip() for name in fields.split(",") if name.strip()]
+    columns = model.__table__.columns
+    unknown = [name for name in names if name not in columns]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown field(s): {', '.join(unknown)}")
+    return [getattr(model, name) for name in dict.fromkeys(names)]
+
+def fetch_rows(db: Session, model, fields: Optional[str], apply_filters=None):
+    """Load rows of a model, selecting only the requested columns in SQL"""
+    columns = select_fields(model, fields)
+    query = db.query(*columns) if columns else db.query(model)
+    if apply_filters:
+        query = apply_filters(query)
+    if columns:
+        return [row._asdict() for row in query.all()]
+    return query.all()
+
+def tag_rows(model, rows, **tags):
+    """Convert ORM objects or projected rows to dicts carrying extra keys"""
+    tagged = []
+    for row in rows:
+        if not isinstance(row, dict):
+            row = {column.name: getattr(row, column.name) for column in model.__table__.columns}
+        tagged.append({**row, **tags})
+    return tagged
+
 # ==================== AUTHENTICATION ROUTES ====================
 
 @app.post("/signup", response_model=UserSchema, status_code=status.HTTP_201_CREATED)
@@ -129,29 +192,29 @@ def get_assets(
     type: Optional[str] = Query(None),
     status: Optional[str] = Query(None),
     assignee: Optional[str] = Query(None),
-    search: Optional[str] = Query(None)
+    search: Optional[str] = Query(None),
+    fields: Optional[str] = Query(None)
 ):
-    query = db.query(Asset)
-
-    if brand:
-        query = query.filter(Asset.brand.ilike(f"%{brand}%"))
-    if type:
-        query = query.filter(Asset.type.ilike(f"%{type}%"))
-    if status:
-        query = query.filter(Asset.status.ilike(f"%{status}%"))
-    if assignee:
-        query = query.filter(Asset.assignee.ilike(f"%{assignee}%"))
-    if search:
-        query = query.filter(
-            (Asset.brand.ilike(f"%{search}%")) |
-            (Asset.model.ilike(f"%{search}%")) |
-            (Asset.serial.ilike(f"%{search}%")) |
-            (Asset.id.ilike(f"%{search}%")) |
-            (Asset.assignee.ilike(f"%{search}%"))
-        )
-
-    results = query.all()
-    return results
+    def apply_filters(query):
+        if brand:
+            query = query.filter(Asset.brand.ilike(f"%{brand}%"))
+        if type:
+            query = query.filter(Asset.type.ilike(f"%{type}%"))
+        if status:
+            query = query.filter(Asset.status.ilike(f"%{status}%"))
+        if assignee:
+            query = query.filter(Asset.assignee.ilike(f"%{assignee}%"))
+        if search:
+            query = query.filter(
+                (Asset.brand.ilike(f"%{search}%")) |
+                (Asset.model.ilike(f"%{search}%")) |
+                (Asset.serial.ilike(f"%{search}%")) |
+                (Asset.id.ilike(f"%{search}%")) |
+                (Asset.assignee.ilike(f"%{search}%"))
+            )
+        return query
+
+    return fetch_rows(db, Asset, fields, apply_filters)
 
 @app.post("/assets")
 def create_asset(
@@ -194,6 +257,7 @@ def create_asset(
     db.add(new_asset)
     db.commit()
     db.refresh(new_asset)
+    asset_snapshot.mark_dirty(new_asset.id)
     
     return {"message": "Asset added successfully", "asset": new_asset}
 
@@ -207,8 +271,10 @@ def delete_asset(
     if not asset:
         raise HTTPException(status_code=404, detail="Asset not found.")
 
+    detach_asset_history(db, asset_id)
     db.delete(asset)
     db.commit()
+    asset_snapshot.mark_dirty(asset_id)
     return {"message": f"Asset '{asset_id}' deleted successfully."}
 
 @app.patch("/assets/{asset_id}")
@@ -228,6 +294,7 @@ def update_asset(
 
     db.commit()
     db.refresh(asset)
+    asset_snapshot.mark_dirty(asset_id, asset.id)
     return {"message": f"Asset '{asset_id}' updated successfully.", "asset": asset}
 
 # ==================== MAINTENANCE ROUTES ====================
@@ -246,24 +313,52 @@ def add_maintenance(
     db.add(maintenance)
     db.commit()
     db.refresh(maintenance)
+    asset_snapshot.mark_dirty(maintenance.asset_id)
     return {"message": "Maintenance record added successfully", "record": maintenance}
 
 @app.get("/maintenance")
 def get_maintenance(
     db: Session = Depends(get_db),
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    fields: Optional[str] = Query(None),
+    include_archived: bool = Query(False)
 ):
-    return db.query(Maintenance).all()
+    records = fetch_rows(db, Maintenance, fields)
+    if include_archived:
+        records = (
+            tag_rows(Maintenance, records, archived=False) +
+            tag_rows(MaintenanceArchive, fetch_rows(db, MaintenanceArchive, fields), archived=True)
+        )
+    return records
+
+@app.post("/maintenance/archive")
+def archive_old_maintenance(
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(get_current_user),
+    older_than_days: int = Query(MAINTENANCE_ARCHIVE_AGE_DAYS, ge=0)
+):
+    """Move maintenance records older than the given age into the archive"""
+    try:
+        return archive_maintenance(db, older_than_days)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
 
 @app.get("/maintenance/{asset_id}")
 def get_asset_maintenance(
     asset_id: str, 
     db: Session = Depends(get_db),
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    include_archived: bool = Query(False)
 ):
     asset = db.query(Asset).filter(Asset.id == asset_id).first()
     if not asset:
         raise HTTPException(status_code=404, detail="Asset not found.")
+    if include_archived:
+        archived = db.query(MaintenanceArchive).filter(MaintenanceArchive.asset_id == asset_id).all()
+        return (
+            tag_rows(Maintenance, asset.maintenance_records, archived=False) +
+            tag_rows(MaintenanceArchive, archived, archived=True)
+        )
     return asset.maintenance_records
 
 @app.delete("/maintenance/{maintenance_id}")
@@ -278,6 +373,7 @@ def delete_maintenance(
     
     db.delete(maintenance)
     db.commit()
+    asset_snapshot.mark_dirty(maintenance.asset_id)
     return {"message": f"Maintenance record {maintenance_id} deleted successfully."}
 
 # ==================== LICENSE ROUTES ====================
@@ -300,9 +396,10 @@ def add_license(
 @app.get("/licenses")
 def get_licenses(
     db: Session = Depends(get_db),
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    fields: Optional[str] = Query(None)
 ):
-    return db.query(SoftwareLicense).all()
+    return fetch_rows(db, SoftwareLicense, fields)
 
 @app.get("/licenses/{license_id}")
 def get_license(
@@ -356,14 +453,14 @@ def get_summary(
     total_active = db.query(func.count()).filter(Asset.status == "Active").scalar()
     total_maintenance = db.query(func.count()).filter(Asset.status == "Under Maintenance").scalar()
     total_cost = db.query(func.sum(Asset.cost)).scalar() or 0.0
-    total_maintenance_cost = db.query(func.sum(Maintenance.cost)).scalar() or 0.0
+    maintenance_cost = total_maintenance_cost(db)
 
     return {
         "total_assets": total_assets,
         "active_assets": total_active,
         "maintenance_assets": total_maintenance,
         "total_asset_cost": total_cost,
-        "total_maintenance_cost": total_maintenance_cost
+        "total_maintenance_cost": maintenance_cost
     }
 
 @app.get("/report/maintenance-costs")
@@ -371,15 +468,15 @@ def maintenance_costs(
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
-    total = db.query(func.sum(Maintenance.cost)).scalar() or 0.0
+    total = total_maintenance_cost(db)
+    totals = maintenance_totals(db)
     breakdown = (
         db.query(
             Asset.id,
             Asset.brand,
-            func.sum(Maintenance.cost).label("total_cost")
+            totals.c.maintenance_cost.label("total_cost")
         )
-        .join(Maintenance, Asset.id == Maintenance.asset_id)
-        .group_by(Asset.id, Asset.brand)
+        .join(totals, Asset.id == totals.c.asset_id)
         .all()
     )
     return {"total_cost": total, "breakdown": [dict(row._asdict()) for row in breakdown]}
@@ -400,6 +497,55 @@ def asset_stats(
         "by_type": by_type,
     }
 
+@app.get("/report/depreciation")
+def depreciation(
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(get_current_user),
+    method: str = Query(STRAIGHT_LINE),
+    useful_life: float = Query(5.0, gt=0),
+    salvage_rate: float = Query(0.0, ge=0, le=1),
+    factor: float = Query(2.0, gt=0),
+    as_of: Optional[date] = Query(None),
+    include_assets: bool = Query(False)
+):
+    """Book value and total cost of ownership per department and type"""
+    if method not in METHODS:
+        raise HTTPException(status_code=400, detail=f"Unknown depreciation method '{method}'")
+
+    fleet = load_fleet(db)
+    return depreciation_report(
+        fleet,
+        method=method,
+        useful_life=useful_life,
+        salvage_rate=salvage_rate,
+        as_of=as_of,
+        factor=factor,
+        include_assets=include_assets
+    )
+
+@app.get("/report/pivot")
+def pivot_report(
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(get_current_user),
+    rows: str = Query(...),
+    cols: Optional[str] = Query(None),
+    measure: str = Query("count"),
+    refresh: bool = Query(False)
+):
+    """Pivot any asset dimension by another, served from the in-memory snapshot"""
+    columns = asset_snapshot.get(db, force_refresh=refresh)
+    try:
+        data = pivot(columns, rows, measure, cols)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {
+        "rows": rows,
+        "cols": cols,
+        "measure": measure,
+        "staleness_seconds": asset_snapshot.staleness(),
+        "data": data,
+    }
+
 # ==================== DEPARTMENT ROUTES ====================
 
 @app.post("/departments", response_model=DepartmentResponse)
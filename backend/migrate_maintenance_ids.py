@@ -0,0 +1,66 @@
+"""One-off migration: rebuild the maintenance table with AUTOINCREMENT ids.
+
+Tables created before maintenance archiving let SQLite reuse the id of the
+highest deleted row, so a new record could take the id of an archived one.
+The whole rebuild runs in a single transaction, so a failure leaves the
+original table untouched.
+
+Usage: python migrate_maintenance_ids.py   (with the API stopped)
+"""
+import sqlite3
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+from database import engine
+from models import Maintenance
+
+COLUMNS = "id, asset_id, date, activity, cost, notes"
+
+
+def table_sql(cursor, name: str):
+    row = cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)).fetchone()
+    return row[0] if row else None
+
+
+def migrate(database_path: str) -> bool:
+    """Rebuild the maintenance table if needed; returns True if it was rebuilt"""
+    # Autocommit mode, so pysqlite doesn't commit the DDL statements on its own
+    conn = sqlite3.connect(database_path, isolation_level=None)
+    cursor = conn.cursor()
+    try:
+        cursor.execute("BEGIN IMMEDIATE")
+        sql = table_sql(cursor, "maintenance")
+        if sql is None or "AUTOINCREMENT" in sql.upper():
+            cursor.execute("COMMIT")
+            return False
+
+        cursor.execute("ALTER TABLE maintenance RENAME TO maintenance_legacy")
+        for index in Maintenance.__table__.indexes:
+            cursor.execute(f"DROP INDEX IF EXISTS {index.name}")
+        cursor.execute(str(CreateTable(Maintenance.__table__).compile(dialect=engine.dialect)))
+        for index in Maintenance.__table__.indexes:
+            cursor.execute(str(CreateIndex(index).compile(dialect=engine.dialect)))
+        cursor.execute(f"INSERT INTO maintenance ({COLUMNS}) SELECT {COLUMNS} FROM maintenance_legacy")
+        cursor.execute("DROP TABLE maintenance_legacy")
+
+        # Start new ids above anything already archived
+        highest_archived = 0
+        if table_sql(cursor, "maintenance_archive") is not None:
+            highest_archived = cursor.execute("SELECT MAX(id) FROM maintenance_archive").fetchone()[0] or 0
+        highest = max(cursor.execute("SELECT MAX(id) FROM maintenance").fetchone()[0] or 0, highest_archived)
+        cursor.execute("DELETE FROM sqlite_sequence WHERE name = 'maintenance'")
+        cursor.execute("INSERT INTO sqlite_sequence (name, seq) VALUES ('maintenance', ?)", (highest,))
+
+        cursor.execute("COMMIT")
+        return True
+    except Exception:
+        cursor.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    if migrate(engine.url.database):
+        print("✅ maintenance table rebuilt with AUTOINCREMENT ids")
+    else:
+        print("✅ maintenance table already uses AUTOINCREMENT, nothing to do")
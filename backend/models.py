@@ -25,6 +25,8 @@ class Asset(Base):
 
 class Maintenance(Base):
     __tablename__ = "maintenance"
+    # Never reuse ids, so a new record can't take the id of an archived one
+    __table_args__ = {"sqlite_autoincrement": True}
 
     id = Column(Integer, primary_key=True, index=True)
     asset_id = Column(String, ForeignKey("assets.id"))
@@ -36,6 +38,27 @@ class Maintenance(Base):
     # Relationship to the Asset table
     asset = relationship("Asset", backref="maintenance_records")
 
+class MaintenanceArchive(Base):
+    __tablename__ = "maintenance_archive"
+
+    id = Column(Integer, primary_key=True, index=True, autoincrement=False)  # id it had in the maintenance table
+    asset_id = Column(String, ForeignKey("assets.id"), index=True)
+    date = Column(DateTime)
+    activity = Column(String, nullable=False)
+    cost = Column(Float, default=0.0)
+    notes = Column(String, nullable=True)
+    archived_at = Column(DateTime, default=datetime.utcnow)
+
+class MaintenanceRollup(Base):
+    __tablename__ = "maintenance_rollups"
+
+    # Running totals of archived maintenance per asset, so cost reports stay correct.
+    # The row with asset_id NULL holds records whose asset has been deleted.
+    id = Column(Integer, primary_key=True, index=True)
+    asset_id = Column(String, ForeignKey("assets.id"), unique=True, nullable=True)
+    record_count = Column(Integer, default=0)
+    total_cost = Column(Float, default=0.0)
+
 class SoftwareLicense(Base):
     __tablename__ = "software_licenses"
 
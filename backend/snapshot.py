@@ -0,0 +1,266 @@
+import re
+import threading
+import time
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from database import SessionLocal
+from models import Asset
+from depreciation import UNASSIGNED
+from archive import maintenance_totals
+
+# How long (in seconds) writes made through this API may go unseen by pivot reports
+SNAPSHOT_MAX_STALENESS_SECONDS = 5.0
+
+# How often (in seconds) the snapshot is fully rebuilt to pick up writes from elsewhere
+SNAPSHOT_REBUILD_INTERVAL_SECONDS = 300.0
+
+# Asset columns that can be used as pivot rows/cols
+DIMENSIONS = ("type", "brand", "model", "status", "warranty_status", "assignee", "department", "location")
+
+# Numeric columns that can be aggregated, and the supported aggregates
+MEASURE_FIELDS = ("cost", "maintenance_cost", "tco")
+AGGREGATES = ("sum", "avg", "min", "max", "count")
+
+MEASURE_PATTERN = re.compile(r"^\s*(\w+)\s*\(\s*(\w*)\s*\)\s*$")
+
+
+def parse_measure(measure: str):
+    """Split 'sum(cost)' into ('sum', 'cost'); plain 'count' is also accepted"""
+    if measure.strip() in ("count", "count()"):
+        return "count", None
+    match = MEASURE_PATTERN.match(measure)
+    if not match:
+        raise ValueError(f"Invalid measure '{measure}'. Use e.g. sum(cost) or count")
+    aggregate, field = match.group(1).lower(), match.group(2)
+    if aggregate not in AGGREGATES:
+        raise ValueError(f"Unknown aggregate '{aggregate}'. Use one of {', '.join(AGGREGATES)}")
+    if aggregate == "count":
+        return "count", None
+    if field not in MEASURE_FIELDS:
+        raise ValueError(f"Unknown measure field '{field}'. Use one of {', '.join(MEASURE_FIELDS)}")
+    return aggregate, field
+
+
+def fetch_columns(db: Session, asset_ids=None):
+    """Query assets joined with maintenance totals and return them column by column"""
+    totals = maintenance_totals(db, asset_ids)
+    query = (
+        db.query(
+            Asset.id,
+            *[getattr(Asset, name) for name in DIMENSIONS],
+            Asset.cost,
+            func.coalesce(totals.c.maintenance_cost, 0.0)
+        )
+        .outerjoin(totals, Asset.id == totals.c.asset_id)
+    )
+    if asset_ids is not None:
+        query = query.filter(Asset.id.in_(asset_ids))
+    rows = query.all()
+
+    names = ("id",) + DIMENSIONS + ("cost", "maintenance_cost")
+    values = list(zip(*rows)) if rows else [()] * len(names)
+    columns = {}
+    for name, column in zip(names, values):
+        if name in ("cost", "maintenance_cost"):
+            columns[name] = np.array(column, dtype=np.float64)
+        elif name == "id":
+            columns[name] = np.array(column, dtype=object)
+        else:
+            columns[name] = np.array([v if v else UNASSIGNED for v in column], dtype=object)
+    columns["tco"] = columns["cost"] + columns["maintenance_cost"]
+    return columns
+
+
+class AssetSnapshot:
+    """Column-oriented, in-memory copy of assets used to answer pivot reports.
+
+    Write routes call mark_dirty() with the affected asset IDs. Once those
+    changes are older than max_staleness, the next read re-queries just those
+    assets and patches them in. Writes made outside this process (other
+    workers, scripts) are picked up by a full rebuild every rebuild_interval,
+    which runs in a background thread while reads keep using the old columns.
+
+    Queries run outside the state lock, so write routes never wait on them.
+    """
+
+    def __init__(self, max_staleness: float = SNAPSHOT_MAX_STALENESS_SECONDS,
+                 rebuild_interval: float = SNAPSHOT_REBUILD_INTERVAL_SECONDS,
+                 session_factory=SessionLocal):
+        self.max_staleness = max_staleness
+        self.rebuild_interval = rebuild_interval
+        self.session_factory = session_factory
+        self.columns = None
+        self.built_at = None
+        self.dirty = set()
+        self.dirty_since = None
+        self.rebuild_thread = None
+        self.rebuild_started_at = None
+        self.applied_during_rebuild = set()
+        self.lock = threading.Lock()
+        self.dirty_lock = threading.Lock()
+        self.refresh_lock = threading.Lock()
+
+    def mark_dirty(self, *asset_ids):
+        """Record that these assets changed and must be re-read"""
+        with self.dirty_lock:
+            if self.dirty_since is None:
+                self.dirty_since = time.monotonic()
+            self.dirty.update(a for a in asset_ids if a)
+
+    def get(self, db: Session, force_refresh: bool = False):
+        """Return the columns, catching up on writes that are older than max_staleness"""
+        if self.columns is None:
+            with self.refresh_lock:
+                if self.columns is None:
+                    self._rebuild(db)
+        elif force_refresh or self._dirty_due():
+            with self.refresh_lock:
+                self._apply_dirty(db)
+
+        if self.age() >= self.rebuild_interval:
+            self._start_background_rebuild()
+
+        with self.lock:
+            return self.columns
+
+    def age(self):
+        """Seconds since the snapshot was last rebuilt from the database"""
+        if self.built_at is None:
+            return float("inf")
+        return time.monotonic() - self.built_at
+
+    def staleness(self):
+        """How old the snapshot's last full read of the database is, in seconds"""
+        return round(self.age(), 3)
+
+    def _dirty_due(self):
+        with self.dirty_lock:
+            return bool(self.dirty) and time.monotonic() - self.dirty_since >= self.max_staleness
+
+    def _take_dirty(self):
+        with self.dirty_lock:
+            dirty_ids, dirty_since = self.dirty, self.dirty_since
+            self.dirty, self.dirty_since = set(), None
+        return dirty_ids, dirty_since
+
+    def _restore_dirty(self, dirty_ids, dirty_since):
+        # A refresh failed (e.g. it hit the request deadline), keep the IDs for next time
+        with self.dirty_lock:
+            self.dirty |= dirty_ids
+            if dirty_since is not None:
+                self.dirty_since = min(filter(None, (self.dirty_since, dirty_since)))
+
+    def _rebuild(self, db: Session):
+        # Writes committed before this point are covered by the full query
+        dirty = self._take_dirty()
+        started_at = time.monotonic()
+        with self.lock:
+            self.rebuild_started_at = started_at
+        columns = None
+        try:
+            columns = fetch_columns(db)
+        except Exception:
+            self._restore_dirty(*dirty)
+            raise
+        finally:
+            with self.lock:
+                if columns is not None:
+                    self.columns = columns
+                    self.built_at = started_at
+                self.rebuild_started_at = None
+                # Changes patched into the old columns meanwhile may be missing from the new ones
+                reapply, self.applied_during_rebuild = self.applied_during_rebuild, set()
+            if reapply:
+                self.mark_dirty(*reapply)
+
+    def _apply_dirty(self, db: Session):
+        dirty_ids, dirty_since = self._take_dirty()
+        if not dirty_ids:
+            return
+        try:
+            fresh = fetch_columns(db, list(dirty_ids))
+        except Exception:
+            self._restore_dirty(dirty_ids, dirty_since)
+            raise
+        with self.lock:
+            keep = ~np.isin(self.columns["id"], np.array(list(dirty_ids), dtype=object))
+            self.columns = {
+                name: np.concatenate([column[keep], fresh[name]])
+                for name, column in self.columns.items()
+            }
+            if self.rebuild_started_at is not None:
+                self.applied_during_rebuild |= dirty_ids
+
+    def _start_background_rebuild(self):
+        with self.lock:
+            if self.rebuild_thread is not None:
+                return
+            self.rebuild_thread = threading.Thread(target=self._background_rebuild, daemon=True)
+            self.rebuild_thread.start()
+
+    def _background_rebuild(self):
+        db = self.session_factory()
+        try:
+            self._rebuild(db)
+        except Exception as e:
+            print(f"❌ Snapshot rebuild failed: {e}")
+        finally:
+            db.close()
+            with self.lock:
+                self.rebuild_thread = None
+
+
+def pivot(columns, rows: str, measure: str, cols=None):
+    """Aggregate the measure grouped by the rows (and optionally cols) dimension"""
+    aggregate, field = parse_measure(measure)
+    for dimension in (rows, cols):
+        if dimension is not None and dimension not in DIMENSIONS:
+            raise ValueError(f"Unknown dimension '{dimension}'. Use one of {', '.join(DIMENSIONS)}")
+
+    if len(columns["id"]) == 0:
+        return {}
+
+    row_labels, row_index = np.unique(columns[rows].astype(str), return_inverse=True)
+    if cols:
+        col_labels, col_index = np.unique(columns[cols].astype(str), return_inverse=True)
+    else:
+        col_labels, col_index = np.array([""]), np.zeros(len(row_index), dtype=np.intp)
+
+    cells = len(row_labels) * len(col_labels)
+    cell_index = row_index * len(col_labels) + col_index
+    counts = np.bincount(cell_index, minlength=cells)
+
+    if aggregate == "count":
+        result = counts.astype(np.float64)
+    elif aggregate in ("sum", "avg"):
+        result = np.bincount(cell_index, weights=columns[field], minlength=cells)
+        if aggregate == "avg":
+            result = np.divide(result, counts, out=np.zeros(cells), where=counts > 0)
+    else:
+        fill, reducer = (np.inf, np.minimum) if aggregate == "min" else (-np.inf, np.maximum)
+        result = np.full(cells, fill)
+        reducer.at(result, cell_index, columns[field])
+
+    result = result.reshape(len(row_labels), len(col_labels))
+    counts = counts.reshape(len(row_labels), len(col_labels))
+
+    def value(i, j):
+        if aggregate == "count":
+            return int(result[i, j])
+        return round(float(result[i, j]), 2)
+
+    if not cols:
+        return {label: value(i, 0) for i, label in enumerate(row_labels)}
+    return {
+        row_label: {
+            col_label: value(i, j)
+            for j, col_label in enumerate(col_labels)
+            if counts[i, j] > 0
+        }
+        for i, row_label in enumerate(row_labels)
+    }
+
+
+# Shared snapshot used by the report routes
+asset_snapshot = AssetSnapshot()
@@ -0,0 +1,66 @@
+import os
+import sys
+import tempfile
+
+# The app opens ./itams.db on import, so run the tests from a scratch directory
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.chdir(tempfile.mkdtemp(prefix="itams-tests-"))
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from database import SessionLocal
+from models import Asset, Department, Maintenance, MaintenanceArchive, MaintenanceRollup, SoftwareLicense
+from snapshot import asset_snapshot
+
+
+@pytest.fixture(scope="session")
+def client():
+    return TestClient(main.app)
+
+
+@pytest.fixture(scope="session")
+def auth_headers(client):
+    user = {"email": "tester@example.com", "password": "secret", "company": "ITAMS", "role": "Admin"}
+    client.post("/signup", json=user)
+    response = client.post("/login", data={"username": user["email"], "password": user["password"]})
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    yield session
+    session.close()
+
+
+@pytest.fixture(autouse=True)
+def clean_tables():
+    """Start every test with no assets, maintenance, licenses or departments"""
+    session = SessionLocal()
+    for model in (MaintenanceRollup, MaintenanceArchive, Maintenance, SoftwareLicense, Asset, Department):
+        session.query(model).delete()
+    session.commit()
+    session.close()
+    asset_snapshot.columns = None
+    asset_snapshot.built_at = None
+    asset_snapshot.dirty = set()
+    asset_snapshot.dirty_since = None
+    yield
+
+
+def asset_payload(serial, **overrides):
+    payload = {
+        "type": "Laptop",
+        "brand": "Dell",
+        "model": "Latitude",
+        "serial": serial,
+        "purchase_date": "2023-01-01",
+        "cost": 1000.0,
+        "warranty_status": "Active",
+        "status": "Active",
+    }
+    payload.update(overrides)
+    return payload
@@ -0,0 +1,166 @@
+import sqlite3
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from archive import archive_maintenance
+from migrate_maintenance_ids import migrate
+from models import Maintenance, MaintenanceArchive, MaintenanceRollup
+from conftest import asset_payload
+
+
+def create_asset(client, headers, serial, **overrides):
+    response = client.post("/assets", json=asset_payload(serial, **overrides), headers=headers)
+    return response.json()["asset"]["id"]
+
+
+def add_maintenance(client, headers, asset_id, cost):
+    record = {"asset_id": asset_id, "activity": "Service", "cost": cost}
+    return client.post("/maintenance", json=record, headers=headers).json()["record"]["id"]
+
+
+def archive_all(client, headers):
+    response = client.post("/maintenance/archive?older_than_days=0", headers=headers)
+    assert response.status_code == 200
+    return response.json()
+
+
+def report_totals(client, headers):
+    depreciation = client.get("/report/depreciation?include_assets=true", headers=headers).json()
+    return {
+        "summary": client.get("/report/summary", headers=headers).json()["total_maintenance_cost"],
+        "breakdown": client.get("/report/maintenance-costs", headers=headers).json(),
+        "by_asset": {a["id"]: a["maintenance_cost"] for a in depreciation["assets"]},
+        "pivot": client.get(
+            "/report/pivot?rows=brand&measure=sum(maintenance_cost)&refresh=true", headers=headers
+        ).json()["data"],
+    }
+
+
+def test_archiving_keeps_report_totals(client, auth_headers, db):
+    first = create_asset(client, auth_headers, "SN-1")
+    second = create_asset(client, auth_headers, "SN-2", brand="HP")
+    add_maintenance(client, auth_headers, first, 100.0)
+    add_maintenance(client, auth_headers, first, 25.0)
+    add_maintenance(client, auth_headers, second, 40.0)
+    before = report_totals(client, auth_headers)
+
+    assert archive_all(client, auth_headers)["archived"] == 3
+
+    assert db.query(Maintenance).count() == 0
+    assert report_totals(client, auth_headers) == before
+    assert before["summary"] == 165.0
+
+
+def test_archiving_maintenance_of_deleted_asset(client, auth_headers, db):
+    asset_id = create_asset(client, auth_headers, "SN-1")
+    add_maintenance(client, auth_headers, asset_id, 30.0)
+    client.delete(f"/assets/{asset_id}", headers=auth_headers)
+
+    assert archive_all(client, auth_headers)["archived"] == 1
+    # A second run with another orphan adds to the same bucket
+    other = create_asset(client, auth_headers, "SN-2")
+    add_maintenance(client, auth_headers, other, 20.0)
+    client.delete(f"/assets/{other}", headers=auth_headers)
+    assert archive_all(client, auth_headers)["archived"] == 1
+
+    orphans = db.query(MaintenanceRollup).filter(MaintenanceRollup.asset_id.is_(None)).all()
+    assert [(r.record_count, r.total_cost) for r in orphans] == [(2, 50.0)]
+    assert client.get("/report/summary", headers=auth_headers).json()["total_maintenance_cost"] == 50.0
+
+
+def test_new_asset_does_not_inherit_deleted_asset_history(client, auth_headers, db):
+    asset_id = create_asset(client, auth_headers, "SN-1")
+    add_maintenance(client, auth_headers, asset_id, 999.0)
+    archive_all(client, auth_headers)
+    client.delete(f"/assets/{asset_id}", headers=auth_headers)
+
+    reused_id = create_asset(client, auth_headers, "SN-2")
+
+    assert reused_id == asset_id
+    totals = report_totals(client, auth_headers)
+    assert totals["by_asset"][reused_id] == 0.0
+    assert totals["summary"] == 999.0
+    history = client.get(f"/maintenance/{reused_id}?include_archived=true", headers=auth_headers).json()
+    assert history == []
+    assert db.query(MaintenanceArchive).filter(MaintenanceArchive.asset_id.is_(None)).count() == 1
+
+
+def test_read_through_ids_are_unique_and_tagged(client, auth_headers):
+    asset_id = create_asset(client, auth_headers, "SN-1")
+    old_ids = [add_maintenance(client, auth_headers, asset_id, 10.0) for _ in range(2)]
+    archive_all(client, auth_headers)
+    new_id = add_maintenance(client, auth_headers, asset_id, 5.0)
+
+    records = client.get("/maintenance?include_archived=true", headers=auth_headers).json()
+
+    assert new_id not in old_ids
+    assert sorted((r["id"], r["archived"]) for r in records) == sorted(
+        [(i, True) for i in old_ids] + [(new_id, False)]
+    )
+    assert client.get("/maintenance", headers=auth_headers).json()[0]["id"] == new_id
+
+
+def make_legacy_database(path, with_notes=True):
+    # Schema as created before the maintenance table used AUTOINCREMENT
+    notes = ", notes VARCHAR" if with_notes else ""
+    conn = sqlite3.connect(path)
+    conn.executescript(f"""
+        CREATE TABLE maintenance (
+            id INTEGER NOT NULL, asset_id VARCHAR, date DATETIME,
+            activity VARCHAR NOT NULL, cost FLOAT{notes}, PRIMARY KEY (id)
+        );
+        CREATE INDEX ix_maintenance_id ON maintenance (id);
+        CREATE TABLE maintenance_archive (
+            id INTEGER NOT NULL PRIMARY KEY, asset_id VARCHAR, date DATETIME,
+            activity VARCHAR NOT NULL, cost FLOAT, notes VARCHAR, archived_at DATETIME
+        );
+        INSERT INTO maintenance (id, asset_id, date, activity, cost) VALUES (1, 'GEN-001', '2020-01-01', 'Repair', 10);
+        INSERT INTO maintenance_archive (id, asset_id, date, activity, cost) VALUES (7, 'GEN-001', '2019-01-01', 'Service', 5);
+    """)
+    conn.commit()
+    conn.close()
+
+
+def test_migration_upgrades_legacy_table(tmp_path):
+    path = str(tmp_path / "legacy.db")
+    make_legacy_database(path)
+
+    assert migrate(path) is True
+    assert migrate(path) is False
+
+    conn = sqlite3.connect(path)
+    sql = conn.execute("SELECT sql FROM sqlite_master WHERE name = 'maintenance'").fetchone()[0]
+    assert "AUTOINCREMENT" in sql
+    assert conn.execute("SELECT id, activity FROM maintenance").fetchall() == [(1, "Repair")]
+    new_id = conn.execute("INSERT INTO maintenance (asset_id, activity) VALUES ('GEN-001', 'New')").lastrowid
+    assert new_id > 7
+    conn.close()
+
+
+def test_failed_migration_leaves_table_untouched(tmp_path):
+    path = str(tmp_path / "legacy.db")
+    make_legacy_database(path, with_notes=False)
+
+    with pytest.raises(sqlite3.OperationalError):
+        migrate(path)
+
+    conn = sqlite3.connect(path)
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    sql = conn.execute("SELECT sql FROM sqlite_master WHERE name = 'maintenance'").fetchone()[0]
+    assert "maintenance_legacy" not in tables
+    assert "AUTOINCREMENT" not in sql
+    assert conn.execute("SELECT COUNT(*) FROM maintenance").fetchone()[0] == 1
+    conn.close()
+
+
+def test_archiving_refuses_legacy_table(tmp_path):
+    path = str(tmp_path / "legacy.db")
+    make_legacy_database(path)
+    session = sessionmaker(bind=create_engine(f"sqlite:///{path}"))()
+
+    with pytest.raises(RuntimeError):
+        archive_maintenance(session, older_than_days=0)
+
+    session.close()
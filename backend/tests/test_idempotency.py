@@ -0,0 +1,96 @@
+import hashlib
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+from fastapi.testclient import TestClient
+
+from idempotency import IdempotencyMiddleware, IdempotencyStore, principal
+from models import Asset
+from conftest import asset_payload
+
+
+def test_retried_create_is_replayed(client, auth_headers, db):
+    headers = {**auth_headers, "Idempotency-Key": "create-1"}
+    first = client.post("/assets", json=asset_payload("SN-1"), headers=headers)
+    second = client.post("/assets", json=asset_payload("SN-1"), headers=headers)
+
+    assert first.status_code == 200
+    assert second.status_code == 200
+    assert second.json() == first.json()
+    assert second.headers["idempotent-replayed"] == "true"
+    assert db.query(Asset).count() == 1
+
+
+def test_reused_key_with_different_body_is_rejected(client, auth_headers):
+    headers = {**auth_headers, "Idempotency-Key": "create-2", "Origin": "http://localhost:5173"}
+    client.post("/assets", json=asset_payload("SN-2"), headers=headers)
+    response = client.post("/assets", json=asset_payload("SN-3"), headers=headers)
+
+    assert response.status_code == 422
+    # CORS wraps the middleware, so the SPA can read the error
+    assert response.headers["access-control-allow-origin"] == "http://localhost:5173"
+
+
+def test_replay_does_not_repeat_cors_headers_of_first_caller(client, auth_headers):
+    headers = {**auth_headers, "Idempotency-Key": "create-3"}
+    client.post("/assets", json=asset_payload("SN-4"), headers={**headers, "Origin": "http://localhost:5173"})
+    response = client.post("/assets", json=asset_payload("SN-4"), headers={**headers, "Origin": "http://localhost:3000"})
+
+    assert response.headers["idempotent-replayed"] == "true"
+    assert response.headers.get_list("access-control-allow-origin") == ["http://localhost:3000"]
+
+
+def make_app(handler, store):
+    app = Starlette(routes=[Route("/things", handler, methods=["POST"])])
+    return TestClient(IdempotencyMiddleware(app, paths=["/things"], store=store))
+
+
+def test_request_still_in_flight_gets_409():
+    store = IdempotencyStore()
+    calls = []
+
+    async def handler(request):
+        calls.append(1)
+        return JSONResponse({"ok": True})
+
+    client = make_app(handler, store)
+    body = b'{"name": "x"}'
+    store.reserve((principal({}), "/things", b"busy"), hashlib.sha256(body).hexdigest())
+
+    response = client.post("/things", content=body, headers={"Idempotency-Key": "busy"})
+
+    assert response.status_code == 409
+    assert calls == []
+
+
+def test_server_error_releases_the_key():
+    store = IdempotencyStore()
+    calls = []
+
+    async def handler(request):
+        calls.append(1)
+        if len(calls) == 1:
+            return JSONResponse({"detail": "boom"}, status_code=500)
+        return JSONResponse({"ok": True}, status_code=201)
+
+    client = make_app(handler, store)
+    headers = {"Idempotency-Key": "retry-me"}
+
+    assert client.post("/things", json={"name": "x"}, headers=headers).status_code == 500
+    retried = client.post("/things", json={"name": "x"}, headers=headers)
+    replayed = client.post("/things", json={"name": "x"}, headers=headers)
+
+    assert retried.status_code == 201
+    assert "idempotent-replayed" not in retried.headers
+    assert replayed.status_code == 201
+    assert replayed.headers["idempotent-replayed"] == "true"
+    assert len(calls) == 2
+
+
+def test_store_evicts_least_recently_used():
+    store = IdempotencyStore(max_entries=2)
+    for key in ("a", "b", "c"):
+        store.reserve(key, "f")
+        store.complete(key, "f", {"status": 200})
+
+    assert list(store.entries) == ["b", "c"]